@@ -1,114 +1,406 @@
 #!/usr/bin/env python3
+import asyncio
+import functools
+import logging
 import os
-import requests
+import random
 import time
 import threading
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from itertools import chain
+from typing import Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Any, Set, Tuple
+from zoneinfo import ZoneInfo
+import httpx
+import ijson
+import orjson
 from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("sleeper_mcp")
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 mcp = FastMCP("Sleeper Fantasy Football MCP Server")
 
 # Sleeper API base URL
 SLEEPER_BASE_URL = "https://api.sleeper.app/v1"
 
+# Cache TTLs in seconds, per endpoint
+NFL_STATE_TTL = 600  # the current week only rolls over once a week
+PLAYERS_TTL = 86400  # Sleeper asks that the full players dump be fetched at most once per day
+LEAGUE_TTL = 300  # rosters, league users and user leagues
+USER_TTL = 3600
+MATCHUPS_TTL = 300
+MATCHUPS_LIVE_TTL = 30  # while games are being played
+STALE_TTL = 86400  # how long past expiry a cached response may be served if Sleeper is failing
+STALE_RETRY_INTERVAL = 30  # after a failed refresh, serve the stale entry this long before trying again
+CACHE_MAX_ENTRIES = 1024  # paths include caller-supplied usernames and league ids, so cap the cache
+
+# Roster fields holding non-starting players, in lineup order
+BENCH_SLOTS = ("reserve", "taxi")
+
+# Player index entry for IDs missing from the players dump
+PLAYER_NOT_FOUND = ("Player not found", "Unknown", "Unknown")
+
+# Retry policy for Sleeper requests
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5  # sleeps ~0.5s, 1s, 2s between attempts
+RETRY_MAX_DELAY = 30
+RETRY_JITTER = 0.5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Seconds between keep-alive pings when RENDER_FREE_TIER=1
+KEEP_ALIVE_INTERVAL = 300
+
+# Regular weekly NFL game windows in US Eastern time as (weekday, start hour, end hour);
+# Monday is 0. Covers Sunday from the 9:30 international games on, Thursday/Monday night,
+# late-season and playoff Saturdays, and an extra hour past midnight for night games
+# running long. Holiday and other date-specific slots are in _special_game_windows.
+NFL_TIMEZONE = ZoneInfo("America/New_York")
+GAME_WINDOWS = (
+    (0, 0, 1),    # Sunday night overtime
+    (0, 19, 24),  # Monday night
+    (1, 0, 1),    # Monday night overtime
+    (3, 19, 24),  # Thursday night
+    (4, 0, 1),    # Thursday night overtime
+    (5, 12, 24),  # Saturday (late season and playoffs)
+    (6, 0, 1),    # Saturday night overtime
+    (6, 9, 24),   # Sunday, including international games
+)
+
+@functools.lru_cache(maxsize=4)
+def _special_game_windows(year: int) -> Dict[date, Tuple[int, int]]:
+    """Date-specific game windows in US Eastern time as date -> (start hour, end hour).
+    
+    Covers the Week 1 Friday night international game, Thanksgiving, Black Friday,
+    Christmas Eve and Christmas Day. End hours past 24 run into the next day.
+    """
+    september_first = date(year, 9, 1)
+    labor_day = september_first + timedelta(days=(0 - september_first.weekday()) % 7)
+    november_first = date(year, 11, 1)
+    thanksgiving = november_first + timedelta(days=(3 - november_first.weekday()) % 7 + 21)
+    return {
+        labor_day + timedelta(days=4): (19, 25),  # Week 1 Friday night
+        thanksgiving: (12, 25),
+        thanksgiving + timedelta(days=1): (12, 25),  # Black Friday
+        date(year, 12, 24): (12, 25),
+        date(year, 12, 25): (12, 25),
+    }
+
+def _matchups_ttl() -> int:
+    """TTL for matchups: short while games are live so scores stay fresh"""
+    now = datetime.now(NFL_TIMEZONE)
+    for weekday, start, end in GAME_WINDOWS:
+        if now.weekday() == weekday and start <= now.hour < end:
+            return MATCHUPS_LIVE_TTL
+    
+    # Check today's special window, and yesterday's in case it runs past midnight
+    today = now.date()
+    yesterday = today - timedelta(days=1)
+    for day, hour in ((today, now.hour), (yesterday, now.hour + 24)):
+        window = _special_game_windows(day.year).get(day)
+        if window and window[0] <= hour < window[1]:
+            return MATCHUPS_LIVE_TTL
+    return MATCHUPS_TTL
+
+class _ResponseReader:
+    """Async file-like view of a streamed httpx response, as consumed by ijson"""
+    
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+    
+    async def read(self, size: int = -1) -> bytes:
+        # ijson probes with read(0) to detect bytes vs str, which must not consume a chunk
+        if size == 0:
+            return b""
+        return await anext(self._chunks, b"")
+
+async def _parse_json(response: httpx.Response) -> Any:
+    """Parse a response body with orjson"""
+    return orjson.loads(await response.aread())
+
+async def _parse_player_index(response: httpx.Response) -> Dict[str, Tuple[str, str, str]]:
+    """Stream the players dump into a player_id -> (full_name, position, team) index.
+    
+    The dump is several MB, so players are parsed one at a time rather than
+    materializing the whole payload.
+    """
+    player_index = {}
+    async for player_id, player in ijson.kvitems_async(_ResponseReader(response), ""):
+        player_index[player_id] = (
+            player.get("full_name", "Unknown"),
+            player.get("position", "Unknown"),
+            player.get("team", "Unknown")
+        )
+    return player_index
+
+def _player_entry(player_id: str, player_index: Dict[str, Tuple[str, str, str]]) -> Dict:
+    """Format a rostered player for a lineup"""
+    name, position, team = player_index.get(player_id, PLAYER_NOT_FOUND)
+    return {
+        "player_id": player_id,
+        "name": name,
+        "position": position,
+        "team": team
+    }
+
+_jitter = random.SystemRandom()
+
+# Paths served from stale cache entries during the current tool call, see SleeperAPI.track_stale
+_stale_paths: ContextVar[Optional[Set[str]]] = ContextVar("stale_paths", default=None)
+
+class _CacheEntry(NamedTuple):
+    """A cached response; times are on the time.monotonic() clock"""
+    expires_at: float
+    value: Any
+    stale_until: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stale: bool = False  # set while serving a stale value after a failed refresh
+
+def _mark_stale(path: str) -> None:
+    """Record that path was served stale in the current tool call, if it is tracking"""
+    stale_paths = _stale_paths.get()
+    if stale_paths is not None:
+        stale_paths.add(path)
+
+def _rate_limit_delay(response: httpx.Response) -> Optional[float]:
+    """Seconds until a rate-limited request may be retried, from Retry-After or X-RateLimit-Reset"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    
+    reset = response.headers.get("X-RateLimit-Reset")
+    if reset:
+        try:
+            reset_at = float(reset)
+        except ValueError:
+            return None
+        # Either an epoch timestamp or a number of seconds until the window resets
+        return max(0.0, reset_at - time.time()) if reset_at > 1e9 else max(0.0, reset_at)
+    return None
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Exponential backoff with jitter, deferring to the server's rate-limit headers on 429"""
+    delay = None
+    if response is not None and response.status_code == 429:
+        delay = _rate_limit_delay(response)
+    if delay is None:
+        delay = RETRY_BACKOFF_FACTOR * 2 ** attempt
+    return min(RETRY_MAX_DELAY, delay) + _jitter.uniform(0, RETRY_JITTER)
+
 class SleeperAPI:
     """Client for interacting with the Sleeper Fantasy Football API"""
     
     def __init__(self):
         self.base_url = SLEEPER_BASE_URL
-        self.session = requests.Session()
-        # Add a small delay to respect rate limits
-        self.session.headers.update({
-            'User-Agent': 'Sleeper-MCP-Server/1.0'
-        })
-    
-    def get_user_by_username(self, username: str) -> Optional[Dict]:
-        """Get user information by username with retry logic"""
-        for attempt in range(3):
+        # One pooled HTTP/2 client shared by every tool call on the event loop;
+        # retries are handled by _request_with_retry
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            ),
+            timeout=10,
+            headers={
+                'User-Agent': 'Sleeper-MCP-Server/1.0',
+                # Compressed bodies cut the players dump from ~5MB to a fraction of that
+                'Accept-Encoding': 'gzip, br'
+            }
+        )
+        # Response cache in least-recently-used order: path -> parsed response;
+        # expired entries are kept as a fallback until their stale_until passes
+        self._cache: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # In-flight fetches by path, so concurrent misses share a single request;
+        # each is removed as soon as it completes
+        self._inflight: Dict[str, "asyncio.Future[Tuple[Any, bool]]"] = {}
+    
+    def _cached(self, path: str) -> Tuple[bool, Any]:
+        """Return (hit, value) for a path in the cache"""
+        entry = self._cache.get(path)
+        if entry and time.monotonic() < entry.expires_at:
+            self._cache.move_to_end(path)
+            if entry.stale:
+                _mark_stale(path)
+            return True, entry.value
+        return False, None
+    
+    def _store(self, path: str, entry: _CacheEntry) -> None:
+        """Cache an entry, dropping entries past stale_until and the least recently used beyond CACHE_MAX_ENTRIES"""
+        self._cache[path] = entry
+        self._cache.move_to_end(path)
+        now = time.monotonic()
+        for stale_path in [p for p, e in self._cache.items() if now >= e.stale_until]:
+            del self._cache[stale_path]
+        while len(self._cache) > CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+    
+    @contextmanager
+    def track_stale(self) -> Iterator[Set[str]]:
+        """Collect the paths served from stale cache entries within the block, including from gathered tasks"""
+        stale_paths: Set[str] = set()
+        token = _stale_paths.set(stale_paths)
+        try:
+            yield stale_paths
+        finally:
+            _stale_paths.reset(token)
+    
+    async def _request_with_retry(self, method: str, path: str, timeout: float = 10,
+                                  headers: Optional[Dict[str, str]] = None,
+                                  max_retries: int = MAX_RETRIES) -> httpx.Response:
+        """Send a request, retrying transport errors and RETRY_STATUS_CODES responses.
+        
+        The response is streamed; callers must read and close it. A 304 Not Modified
+        is returned as-is for conditional requests.
+        """
+        for attempt in range(max_retries + 1):
+            last_attempt = attempt == max_retries
             try:
-                response = self.session.get(f"{self.base_url}/user/{username}", timeout=10)
-                response.raise_for_status()
-                return response.json()
-            except requests.RequestException as e:
-                print(f"Error fetching user {username} (attempt {attempt + 1}): {e}")
-                if attempt < 2:  # Don't sleep on last attempt
-                    time.sleep(1 * (attempt + 1))  # Exponential backoff
-                else:
-                    return None
-        return None
-    
-    def get_user_leagues(self, user_id: str, season: str = "2024") -> List[Dict]:
-        """Get all leagues for a user in a specific season"""
+                request = self.client.build_request(method, path, timeout=timeout, headers=headers)
+                response = await self.client.send(request, stream=True)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                return response
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                try:
+                    return response.raise_for_status()
+                except httpx.HTTPStatusError:
+                    await response.aclose()
+                    raise
+            await response.aclose()
+            await asyncio.sleep(_retry_delay(attempt, response))
+    
+    async def _get_json(self, path: str, ttl: float, default: Any = None, timeout: float = 10,
+                        parse: Callable[[httpx.Response], Awaitable[Any]] = _parse_json) -> Any:
+        """GET a Sleeper API path, serving it from the cache for ttl seconds.
+        
+        Concurrent misses on the same path share one in-flight fetch and its
+        result, including a failure. If Sleeper fails, the last good response is
+        served for up to STALE_TTL past its expiry, and kept for STALE_RETRY_INTERVAL
+        before Sleeper is tried again; otherwise default is returned. Expired entries
+        are revalidated with If-None-Match/If-Modified-Since, so an unchanged response
+        costs a 304 instead of a full download. parse turns the streamed response
+        into the value that gets cached.
+        """
+        hit, value = self._cached(path)
+        if hit:
+            return value
+        
+        fetch = self._inflight.get(path)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self._fetch(path, ttl, default, timeout, parse))
+            self._inflight[path] = fetch
+            fetch.add_done_callback(lambda done: self._inflight.pop(path) if self._inflight.get(path) is done else None)
+        # Shielded so a cancelled caller doesn't cancel the fetch for the other waiters
+        value, stale = await asyncio.shield(fetch)
+        if stale:
+            _mark_stale(path)
+        return value
+    
+    async def _fetch(self, path: str, ttl: float, default: Any, timeout: float,
+                     parse: Callable[[httpx.Response], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Fetch a path for _get_json and update the cache; returns (value, served stale)"""
+        entry = self._cache.get(path)
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        
+        # With a stale fallback on hand, a single attempt is enough before serving it
+        has_fallback = entry is not None and time.monotonic() < entry.stale_until
         try:
-            response = self.session.get(f"{self.base_url}/user/{user_id}/leagues/nfl/{season}")
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching leagues for user {user_id}: {e}")
-            return []
-    
-    def get_league_rosters(self, league_id: str) -> List[Dict]:
+            response = await self._request_with_retry("GET", path, timeout=timeout, headers=headers,
+                                                      max_retries=0 if has_fallback else MAX_RETRIES)
+            try:
+                not_modified = entry is not None and response.status_code == httpx.codes.NOT_MODIFIED
+                value = entry.value if not_modified else await parse(response)
+            finally:
+                await response.aclose()
+        except (httpx.HTTPError, ValueError, ijson.JSONError) as e:
+            # Client errors such as a 404 reflect the request, not an upstream outage
+            upstream_failure = (not isinstance(e, httpx.HTTPStatusError)
+                                or e.response.status_code in RETRY_STATUS_CODES)
+            if upstream_failure and has_fallback:
+                logger.warning("Error fetching %s, serving stale cached response: %s", path, e)
+                # Back off so later callers get the stale value without hitting Sleeper again
+                retry_at = min(time.monotonic() + STALE_RETRY_INTERVAL, entry.stale_until)
+                self._store(path, entry._replace(expires_at=retry_at, stale=True))
+                return entry.value, True
+            logger.warning("Error fetching %s: %s", path, e)
+            return default, False
+        # A 304 may omit the validators, in which case the previous ones still apply
+        etag = response.headers.get("ETag") or (entry.etag if not_modified else None)
+        last_modified = response.headers.get("Last-Modified") or (entry.last_modified if not_modified else None)
+        expires_at = time.monotonic() + ttl
+        self._store(path, _CacheEntry(expires_at, value, expires_at + STALE_TTL, etag, last_modified))
+        return value, False
+    
+    async def get_user_by_username(self, username: str) -> Optional[Dict]:
+        """Get user information by username"""
+        return await self._get_json(f"/user/{username}", USER_TTL)
+    
+    async def get_user_leagues(self, user_id: str, season: str = "2024") -> List[Dict]:
+        """Get all leagues for a user in a specific season"""
+        return await self._get_json(f"/user/{user_id}/leagues/nfl/{season}", LEAGUE_TTL, [])
+    
+    async def get_league_rosters(self, league_id: str) -> List[Dict]:
         """Get all rosters in a league"""
-        try:
-            response = self.session.get(f"{self.base_url}/league/{league_id}/rosters")
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching rosters for league {league_id}: {e}")
-            return []
-    
-    def get_league_users(self, league_id: str) -> List[Dict]:
+        return await self._get_json(f"/league/{league_id}/rosters", LEAGUE_TTL, [])
+    
+    async def get_league_users(self, league_id: str) -> List[Dict]:
         """Get all users in a league"""
-        try:
-            response = self.session.get(f"{self.base_url}/league/{league_id}/users")
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching users for league {league_id}: {e}")
-            return []
-    
-    def get_league_matchups(self, league_id: str, week: int) -> List[Dict]:
-        """Get matchups for a specific week in a league with retry logic"""
-        for attempt in range(3):
-            try:
-                response = self.session.get(f"{self.base_url}/league/{league_id}/matchups/{week}", timeout=15)
-                response.raise_for_status()
-                return response.json()
-            except requests.RequestException as e:
-                print(f"Error fetching matchups for league {league_id}, week {week} (attempt {attempt + 1}): {e}")
-                if attempt < 2:
-                    time.sleep(2 * (attempt + 1))  # Exponential backoff
-                else:
-                    return []
-        return []
-    
-    def get_nfl_state(self) -> Optional[Dict]:
+        return await self._get_json(f"/league/{league_id}/users", LEAGUE_TTL, [])
+    
+    async def get_league_matchups(self, league_id: str, week: int) -> List[Dict]:
+        """Get matchups for a specific week in a league"""
+        return await self._get_json(f"/league/{league_id}/matchups/{week}", _matchups_ttl(), [], timeout=15)
+    
+    async def get_nfl_state(self) -> Optional[Dict]:
         """Get current NFL state including current week"""
-        try:
-            response = self.session.get(f"{self.base_url}/state/nfl")
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching NFL state: {e}")
-            return None
+        return await self._get_json("/state/nfl", NFL_STATE_TTL)
     
-    def get_players(self) -> Dict:
-        """Get all NFL players"""
-        try:
-            response = self.session.get(f"{self.base_url}/players/nfl")
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching players: {e}")
-            return {}
+    async def get_player_index(self) -> Dict[str, Tuple[str, str, str]]:
+        """Get a player_id -> (full_name, position, team) index of all NFL players"""
+        return await self._get_json("/players/nfl", PLAYERS_TTL, {}, parse=_parse_player_index)
 
 # Initialize Sleeper API client
 sleeper_api = SleeperAPI()
 
+def _flag_stale(tool: Callable[..., Awaitable[Dict]]) -> Callable[..., Awaitable[Dict]]:
+    """Mark a tool's response with "stale": true if any of its data came from a stale cache entry"""
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs) -> Dict:
+        with sleeper_api.track_stale() as stale_paths:
+            result = await tool(*args, **kwargs)
+        if stale_paths:
+            result["stale"] = True
+        return result
+    return wrapper
+
 @mcp.tool(description="Get current NFL season state including current week")
-def get_nfl_state() -> Dict:
+@_flag_stale
+async def get_nfl_state() -> Dict:
     """Get the current NFL state including season, week, and season type"""
-    state = sleeper_api.get_nfl_state()
+    state = await sleeper_api.get_nfl_state()
     if state:
         return {
             "season": state.get("season"),
@@ -120,9 +412,10 @@ def get_nfl_state() -> Dict:
     return {"error": "Unable to fetch NFL state"}
 
 @mcp.tool(description="Get user information by Sleeper username")
-def get_user_info(username: str) -> Dict:
+@_flag_stale
+async def get_user_info(username: str) -> Dict:
     """Get user information from Sleeper by username"""
-    user = sleeper_api.get_user_by_username(username)
+    user = await sleeper_api.get_user_by_username(username)
     if user:
         return {
             "user_id": user.get("user_id"),
@@ -133,13 +426,13 @@ def get_user_info(username: str) -> Dict:
     return {"error": f"User '{username}' not found"}
 
 @mcp.tool(description="Get all leagues for a user in the current season")
-def get_user_leagues(username: str, season: str = "2024") -> List[Dict]:
+async def get_user_leagues(username: str, season: str = "2024") -> List[Dict]:
     """Get all leagues for a user in a specific season"""
-    user = sleeper_api.get_user_by_username(username)
+    user = await sleeper_api.get_user_by_username(username)
     if not user:
         return [{"error": f"User '{username}' not found"}]
     
-    leagues = sleeper_api.get_user_leagues(user["user_id"], season)
+    leagues = await sleeper_api.get_user_leagues(user["user_id"], season)
     return [
         {
             "league_id": league.get("league_id"),
@@ -155,76 +448,54 @@ def get_user_leagues(username: str, season: str = "2024") -> List[Dict]:
         for league in leagues
     ]
 
-@mcp.tool(description="Get user's lineup for the current week in a specific league")
-def get_user_lineup(username: str, league_id: str) -> Dict:
-    """Get a user's lineup for the current week in a specific league"""
-    # Get current NFL state
-    nfl_state = sleeper_api.get_nfl_state()
-    if not nfl_state:
-        return {"error": "Unable to fetch current NFL state"}
-    
+async def _build_lineup(username: str, user: Dict, nfl_state: Dict, league_id: str) -> Dict:
+    """Build a user's current week lineup in a league from pre-fetched NFL state and user"""
     current_week = nfl_state.get("week")
-    if not current_week:
-        return {"error": "Unable to determine current week"}
-    
-    # Get user info
-    user = sleeper_api.get_user_by_username(username)
-    if not user:
-        return {"error": f"User '{username}' not found"}
     
-    # Get league rosters
-    rosters = sleeper_api.get_league_rosters(league_id)
+    # Rosters, league users, matchups and the player index are independent, so fetch them concurrently
+    rosters, league_users, matchups, player_index = await asyncio.gather(
+        sleeper_api.get_league_rosters(league_id),
+        sleeper_api.get_league_users(league_id),
+        sleeper_api.get_league_matchups(league_id, current_week),
+        sleeper_api.get_player_index()
+    )
     if not rosters:
         return {"error": f"Unable to fetch rosters for league {league_id}"}
     
-    # Find user's roster
-    user_roster = None
-    for roster in rosters:
-        if roster.get("owner_id") == user["user_id"]:
-            user_roster = roster
-            break
+    # Index rosters by owner and roster id
+    rosters_by_owner = {r.get("owner_id"): r for r in rosters}
+    rosters_by_id = {r.get("roster_id"): r for r in rosters}
     
+    # Find user's roster
+    user_roster = rosters_by_owner.get(user["user_id"])
     if not user_roster:
         return {"error": f"User '{username}' not found in league {league_id}"}
     
-    # Get league users for display names
-    league_users = sleeper_api.get_league_users(league_id)
+    # Map league users for display names
     user_map = {u["user_id"]: u for u in league_users}
     
-    # Get current week matchups
-    matchups = sleeper_api.get_league_matchups(league_id, current_week)
     if not matchups:
         return {"error": f"Unable to fetch matchups for week {current_week}"}
     
     # Find user's matchup
-    user_matchup = None
-    for matchup in matchups:
-        if matchup.get("roster_id") == user_roster["roster_id"]:
-            user_matchup = matchup
-            break
-    
+    matchups_by_roster = {m.get("roster_id"): m for m in matchups}
+    user_matchup = matchups_by_roster.get(user_roster["roster_id"])
     if not user_matchup:
         return {"error": f"No matchup found for user in week {current_week}"}
     
-    # Get opponent info - fix the matchup logic
-    opponent_roster_id = None
-    for matchup in matchups:
-        if (matchup.get("roster_id") != user_roster["roster_id"] and 
-            matchup.get("matchup_id") == user_matchup.get("matchup_id")):
-            opponent_roster_id = matchup.get("roster_id")
-            break
-    
-    opponent_roster = None
-    opponent_user = None
-    if opponent_roster_id:
-        for roster in rosters:
-            if roster.get("roster_id") == opponent_roster_id:
-                opponent_roster = roster
-                opponent_user = user_map.get(roster.get("owner_id"))
-                break
-    
-    # Get players data
-    players = sleeper_api.get_players()
+    # The opponent is the other roster sharing the user's matchup_id (None means no game this week)
+    matchup_id = user_matchup.get("matchup_id")
+    opponent_roster_id = next(
+        (
+            m.get("roster_id") for m in matchups
+            if matchup_id is not None
+            and m.get("matchup_id") == matchup_id
+            and m.get("roster_id") != user_roster["roster_id"]
+        ),
+        None
+    )
+    opponent_roster = rosters_by_id.get(opponent_roster_id) if opponent_roster_id else None
+    opponent_user = user_map.get(opponent_roster.get("owner_id")) if opponent_roster else None
     
     # Format lineup
     lineup = {
@@ -245,69 +516,62 @@ def get_user_lineup(username: str, league_id: str) -> Dict:
     }
     
     # Process starters with better error handling
-    starters = user_roster.get("starters", [])
+    starters = user_roster.get("starters") or ()
     if not starters:
         lineup["starters"] = [{"error": "No starters found in roster"}]
     else:
-        for player_id in starters:
-            if player_id and player_id in players:
-                player = players[player_id]
-                lineup["starters"].append({
-                    "player_id": player_id,
-                    "name": player.get("full_name", "Unknown"),
-                    "position": player.get("position", "Unknown"),
-                    "team": player.get("team", "Unknown")
-                })
-            elif player_id:
-                lineup["starters"].append({
-                    "player_id": player_id,
-                    "name": "Player not found",
-                    "position": "Unknown",
-                    "team": "Unknown"
-                })
-    
-    # Process bench players with better error handling
-    bench = user_roster.get("reserve", []) + user_roster.get("taxi", [])
-    if not bench:
+        lineup["starters"] = [_player_entry(player_id, player_index) for player_id in starters if player_id]
+    
+    # Process bench players across the bench slots without concatenating them; Sleeper sends null for empty slots
+    bench = chain.from_iterable(user_roster.get(slot) or () for slot in BENCH_SLOTS)
+    lineup["bench"] = [_player_entry(player_id, player_index) for player_id in bench if player_id]
+    if not lineup["bench"]:
         lineup["bench"] = [{"info": "No bench players found"}]
-    else:
-        for player_id in bench:
-            if player_id and player_id in players:
-                player = players[player_id]
-                lineup["bench"].append({
-                    "player_id": player_id,
-                    "name": player.get("full_name", "Unknown"),
-                    "position": player.get("position", "Unknown"),
-                    "team": player.get("team", "Unknown")
-                })
-            elif player_id:
-                lineup["bench"].append({
-                    "player_id": player_id,
-                    "name": "Player not found",
-                    "position": "Unknown",
-                    "team": "Unknown"
-                })
     
     return lineup
 
+@mcp.tool(description="Get user's lineup for the current week in a specific league")
+@_flag_stale
+async def get_user_lineup(username: str, league_id: str) -> Dict:
+    """Get a user's lineup for the current week in a specific league"""
+    # Get current NFL state and user info together
+    nfl_state, user = await asyncio.gather(
+        sleeper_api.get_nfl_state(),
+        sleeper_api.get_user_by_username(username)
+    )
+    if not nfl_state:
+        return {"error": "Unable to fetch current NFL state"}
+    
+    if not nfl_state.get("week"):
+        return {"error": "Unable to determine current week"}
+    
+    if not user:
+        return {"error": f"User '{username}' not found"}
+    
+    return await _build_lineup(username, user, nfl_state, league_id)
+
 @mcp.tool(description="Get a user's current week lineup across all their leagues")
-def get_user_weekly_lineup(username: str) -> Dict:
+@_flag_stale
+async def get_user_weekly_lineup(username: str) -> Dict:
     """Get a user's lineup for the current week across all their leagues"""
-    # Get current NFL state
-    nfl_state = sleeper_api.get_nfl_state()
+    # Get current NFL state and user info together
+    nfl_state, user = await asyncio.gather(
+        sleeper_api.get_nfl_state(),
+        sleeper_api.get_user_by_username(username)
+    )
     if not nfl_state:
         return {"error": "Unable to fetch current NFL state"}
     
     current_week = nfl_state.get("week")
     current_season = nfl_state.get("season")
+    if not current_week:
+        return {"error": "Unable to determine current week"}
     
-    # Get user info
-    user = sleeper_api.get_user_by_username(username)
     if not user:
         return {"error": f"User '{username}' not found"}
     
     # Get user's leagues
-    leagues = sleeper_api.get_user_leagues(user["user_id"], str(current_season))
+    leagues = await sleeper_api.get_user_leagues(user["user_id"], str(current_season))
     if not leagues:
         return {"error": f"No leagues found for user '{username}' in season {current_season}"}
     
@@ -321,10 +585,15 @@ def get_user_weekly_lineup(username: str) -> Dict:
         "leagues": []
     }
     
-    # Get lineup for each league
-    for league in leagues:
+    # Build the lineup for every league concurrently
+    lineups = await asyncio.gather(
+        *(_build_lineup(username, user, nfl_state, league["league_id"]) for league in leagues),
+        return_exceptions=True
+    )
+    for league, lineup in zip(leagues, lineups):
         league_id = league["league_id"]
-        lineup = get_user_lineup(username, league_id)
+        if isinstance(lineup, Exception):
+            lineup = {"error": f"Failed to build lineup: {lineup}"}
         
         if "error" not in lineup:
             result["leagues"].append({
@@ -351,47 +620,52 @@ def get_server_info() -> dict:
         "description": "MCP server for interacting with Sleeper Fantasy Football API"
     }
 
-# Add health check tool for monitoring
-@mcp.tool(description="Health check endpoint for monitoring server status")
-def health_check() -> dict:
-    """Health check for Render and monitoring"""
+def _health_status() -> dict:
+    """Health status shared by the health_check tool and the /health route"""
     return {
         "status": "healthy",
         "server": "Sleeper Fantasy Football MCP Server",
-        "timestamp": __import__("datetime").datetime.now().isoformat(),
+        "timestamp": datetime.now().isoformat(),
         "version": "1.0.0",
         "endpoints": {
             "mcp": "/mcp",
-            "health": "use health_check tool"
+            "health": "/health"
         }
     }
 
+# Add health check tool for monitoring
+@mcp.tool(description="Health check endpoint for monitoring server status")
+def health_check() -> dict:
+    """Health check for MCP clients and monitoring"""
+    return _health_status()
+
+# Plain HTTP health check for Render's health probe
+@mcp.custom_route("/health", methods=["GET"])
+async def health_route(request: Request) -> JSONResponse:
+    return JSONResponse(_health_status())
+
 @mcp.tool(description="Debug tool to diagnose lineup retrieval issues")
-def debug_user_roster(username: str, league_id: str) -> dict:
+@_flag_stale
+async def debug_user_roster(username: str, league_id: str) -> dict:
     """Debug tool to help diagnose lineup issues"""
     try:
         # Get user info
-        user = sleeper_api.get_user_by_username(username)
+        user = await sleeper_api.get_user_by_username(username)
         if not user:
             return {"error": f"User '{username}' not found"}
         
         # Get league rosters
-        rosters = sleeper_api.get_league_rosters(league_id)
+        rosters = await sleeper_api.get_league_rosters(league_id)
         if not rosters:
             return {"error": f"Unable to fetch rosters for league {league_id}"}
         
         # Find user's roster
-        user_roster = None
-        for roster in rosters:
-            if roster.get("owner_id") == user["user_id"]:
-                user_roster = roster
-                break
-        
+        user_roster = next((r for r in rosters if r.get("owner_id") == user["user_id"]), None)
         if not user_roster:
             return {"error": f"User '{username}' not found in league {league_id}"}
         
         # Get NFL state
-        nfl_state = sleeper_api.get_nfl_state()
+        nfl_state = await sleeper_api.get_nfl_state()
         
         return {
             "user": {
@@ -409,9 +683,9 @@ def debug_user_roster(username: str, league_id: str) -> dict:
                 "settings": user_roster.get("settings", {})
             },
             "debug_info": {
-                "starters_count": len(user_roster.get("starters", [])),
-                "reserve_count": len(user_roster.get("reserve", [])),
-                "taxi_count": len(user_roster.get("taxi", [])),
+                "starters_count": len(user_roster.get("starters") or ()),
+                "reserve_count": len(user_roster.get("reserve") or ()),
+                "taxi_count": len(user_roster.get("taxi") or ()),
                 "current_week": nfl_state.get("week") if nfl_state else "Unknown"
             }
         }
@@ -419,47 +693,29 @@ def debug_user_roster(username: str, league_id: str) -> dict:
         return {"error": f"Debug failed: {str(e)}"}
 
 def keep_alive():
-    """Keep the server alive by making periodic requests"""
-    import urllib.request
-    import urllib.error
-    
-    while True:
-        try:
-            # Use urllib for more reliable local requests
-            port = os.environ.get('PORT', 8000)
-            url = f"http://localhost:{port}/mcp"
-            
-            # Make a simple HEAD request to keep server warm
-            req = urllib.request.Request(url, method='HEAD')
-            urllib.request.urlopen(req, timeout=10)
-            print(f"Keep-alive ping sent to {url}")
-        except Exception as e:
-            print(f"Keep-alive ping failed: {e}")
-            # Try alternative approach
+    """Keep a free-tier Render instance warm by periodically hitting the /health route"""
+    port = os.environ.get('PORT', 8000)
+    url = f"http://127.0.0.1:{port}/health"
+    # Reuse one pooled client so pings don't open a new connection each time
+    with httpx.Client(timeout=10) as client:
+        while True:
+            time.sleep(KEEP_ALIVE_INTERVAL)
             try:
-                import subprocess
-                subprocess.run(['curl', '-s', '-o', '/dev/null', f'http://localhost:{port}/mcp'], 
-                             timeout=10, check=False)
-                print("Keep-alive via curl successful")
-            except:
-                print("All keep-alive methods failed")
-        
-        time.sleep(180)  # Ping every 3 minutes (more frequent)
+                client.get(url).raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning("Keep-alive ping failed: %s", e)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     host = "0.0.0.0"
     
-    print(f"Starting FastMCP server on {host}:{port}")
+    logger.info("Starting FastMCP server on %s:%s", host, port)
     
-    # Start keep-alive thread in production
-    if os.environ.get("ENVIRONMENT") == "production":
+    # Render's health check polls /health; the self-ping is only needed to keep free-tier instances awake
+    if os.environ.get("ENVIRONMENT") == "production" and os.environ.get("RENDER_FREE_TIER") == "1":
         keep_alive_thread = threading.Thread(target=keep_alive, daemon=True)
         keep_alive_thread.start()
-        print("Keep-alive thread started")
-    
-    # Note: FastMCP handles HTTP endpoints differently
-    # The keep-alive mechanism should prevent server sleep
+        logger.info("Keep-alive thread started")
     
     mcp.run(
         transport="http",